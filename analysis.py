@@ -18,23 +18,81 @@
 
 
 
+import os
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import polars as pl
 
 import panel as pn
-pn.extension()
+# Dispatch widget events to a thread pool so one session's callback does not block the others
+pn.extension(nthreads=os.cpu_count())
 
 import holoviews as hv
 import hvplot.pandas  # To use hvplot with pandas
+from holoviews.operation.datashader import dynspread, rasterize
 from bokeh.models import HoverTool
 
 
 
 
-df = pd.read_excel('Data_cleaned.xlsx')
-idf = df.interactive()
+SOURCE_PATH = 'Data_cleaned.xlsx'
+CACHE_PATH = 'cache.parquet'
+CACHE_META_PATH = 'cache.parquet.meta'
+# Bump whenever the cleaning code below changes what is written to the cache
+CACHE_VERSION = 2
+young_age_cutoff = 40
+# Columns the analyses use; everything else in the source (names, city, bio fields, ...) is never read
+KEEP = [
+    'finalWorth', 'age', 'birthYear', 'is_young', 'age_group', 'category', 'country', 'industries',
+    'cpi_change_country', 'tax_revenue_country_country'
+]
+
+@lru_cache(maxsize=1)
+def load_clean_df():
+    # Reuse the cleaned frame from the Parquet cache unless the Excel source or the cleaning code has changed
+    cache_key = f'{CACHE_VERSION}:{os.path.getmtime(SOURCE_PATH)!r}'
+    cache_is_fresh = False
+    if os.path.exists(CACHE_PATH) and os.path.exists(CACHE_META_PATH):
+        with open(CACHE_META_PATH) as f:
+            cache_is_fresh = f.read() == cache_key
+
+    if not cache_is_fresh:
+        df = pd.read_excel(SOURCE_PATH)
+        final_worth = df['finalWorth']
+        if not pd.api.types.is_numeric_dtype(final_worth):
+            final_worth = final_worth.str.replace('$', '', regex=False).str.replace(',', '', regex=False)
+        df['finalWorth'] = pd.to_numeric(final_worth, downcast='float')
+        df['age'] = 2023 - df['birthYear']  # Calculate age from birth year
+        is_older = df['age'].to_numpy() >= young_age_cutoff
+        df['is_young'] = ~is_older
+        df['age_group'] = pd.Categorical.from_codes(is_older.astype(np.int8), categories=['Young (<40)', 'Older (>=40)'])
+
+        # Rows grouped by category, so each category is a contiguous slice (see BOUNDS)
+        df = df.sort_values('category', kind='stable').reset_index(drop=True)
+
+        df.to_parquet(CACHE_PATH, compression='zstd')
+        with open(CACHE_META_PATH, 'w') as f:
+            f.write(cache_key)
+
+    df = pd.read_parquet(CACHE_PATH, engine='pyarrow', columns=KEEP, dtype_backend='pyarrow')
+    # Low-cardinality grouping keys: store as int codes so groupby/value_counts use the categorical fast path
+    for col in ('category', 'country', 'industries', 'age_group'):
+        df[col] = df[col].astype('category')
+    # datashader cannot aggregate Arrow-backed columns, so keep the scatter-plot axes NumPy-backed
+    for col in ('age', 'finalWorth', 'cpi_change_country', 'tax_revenue_country_country'):
+        df[col] = df[col].astype(df[col].dtype.numpy_dtype)
+    # Narrowest dtypes that hold the ranges involved (wealth in millions, ages 0-120, years 1900-2023)
+    df['finalWorth'] = df['finalWorth'].astype(np.float32)
+    df['age'] = df['age'].astype(np.int8)
+    df['birthYear'] = df['birthYear'].astype(np.int16)
+    return df
+
+df = load_clean_df()
+
+# Lazy Polars view of the same data for the per-interaction filters, so only the needed columns are scanned
+LF = pl.from_pandas(df).lazy()
 
 
 
@@ -47,12 +105,6 @@ df.head()
 df.columns
 
 
-
-df['finalWorth'] = df['finalWorth'].replace({'\$': '', ',': ''}, regex=True).astype(float)
-df['age'] = 2023 - df['birthYear']  # Calculate age from birth year
-df['is_young'] = df['age'] < 40
-
-
 # ## Analyses
 
 # ## 1. Typical wealth of Billionaires in Fields
@@ -67,39 +119,49 @@ print(basic_stats)
 
 from bokeh.palettes import Plasma256
 
-category_select = pn.widgets.Select(name='Select Category', options=df['category'].unique().tolist(), value='Technology')
+# One category dropdown shared by the wealth-distribution and country sections
+CATEGORIES = df['category'].cat.categories.tolist()
+# Row range of each category in the category-sorted frame
+BOUNDS = {c: (df['category'].searchsorted(c, 'left'), df['category'].searchsorted(c, 'right')) for c in CATEGORIES}
+category_select = pn.widgets.Select(name='Select Category', options=CATEGORIES, value='Technology')
 show_all_industries = pn.widgets.Checkbox(name='Show All Industries', value=False)
 
-@pn.depends(category_select.param.value, show_all_industries.param.value)
+# Bin counts and edges per category (plus '_ALL_'), computed once; the callback is a dict lookup
+HIST_CACHE = {c: np.histogram(df['finalWorth'].iloc[lo:hi].to_numpy(), bins=30) for c, (lo, hi) in BOUNDS.items()}
+HIST_CACHE['_ALL_'] = np.histogram(df['finalWorth'].to_numpy(), bins=30)
+
 def update_histogram(selected_category, show_all):
     if show_all:
-        hist_plot = df.hvplot.hist('finalWorth', bins=30,
-        cmap='plasma', title='Distribution of Billionaire Wealth (All Industries)', alpha=0.5, height=400, width=500).opts(ylabel='Number of Billionaires')
+        counts, edges = HIST_CACHE['_ALL_']
+        title = 'Distribution of Billionaire Wealth (All Industries)'
     else:
-        filtered_df = df[df['category'] == selected_category]
-        hist_plot = filtered_df.hvplot.hist('finalWorth', bins=30, cmap='plasma', title=f'Distribution of Billionaire Wealth ({selected_category})', alpha=0.5, height=400, width=500).opts(ylabel='Number of Billionaires')
-    return hist_plot
+        counts, edges = HIST_CACHE[selected_category]
+        title = f'Distribution of Billionaire Wealth ({selected_category})'
+    return hv.Histogram((edges, counts), kdims='finalWorth', vdims='Number of Billionaires', label=title)
+
+# Plot options are applied once; widget changes only swap the data behind the DynamicMap
+wealth_histogram = hv.DynamicMap(update_histogram, streams=[
+    hv.streams.Params(category_select, ['value'], rename={'value': 'selected_category'}),
+    hv.streams.Params(show_all_industries, ['value'], rename={'value': 'show_all'}),
+]).opts(alpha=0.5, height=400, width=500, framewise=True)
 
 wealth_distribution_section = pn.Column(
     "### Wealth Distribution",
     category_select,
     show_all_industries,
-    update_histogram
+    wealth_histogram
 
 )
 
 
 
 
-category_select = pn.widgets.Select(name='Select Category', options=df['category'].unique().tolist(), value='Technology')
-@pn.depends(category_select.param.value)
-def update_avg_wealth(selected_category):
-    avg_wealth_by_category = df.groupby('category')['finalWorth'].mean().reset_index()
-    bar_plot_avg_wealth = avg_wealth_by_category.hvplot.bar(x='category', y='finalWorth', title='Average Wealth by Category', rot=90, height=500, width=500)
-    return bar_plot_avg_wealth
+# The average per category does not depend on any widget, so build the plot once
+AVG_WEALTH = df.groupby('category', observed=True)['finalWorth'].mean().reset_index()
+BAR_AVG = AVG_WEALTH.hvplot.bar(x='category', y='finalWorth', title='Average Wealth by Category', rot=90, height=500, width=500)
 
 average_wealth = pn.Column(
-    update_avg_wealth
+    BAR_AVG
 )
 
 
@@ -109,39 +171,39 @@ average_wealth = pn.Column(
 
 
 
-category_select = pn.widgets.Select(name='Select Category', options=df['category'].unique().tolist(), value='Technology')
 show_all_industries = pn.widgets.Checkbox(name='Show All Industries', value=False)
 
-@pn.depends(category_select.param.value, show_all_industries.param.value)
+# Country counts per category (one column per category), so the callback only has to slice a column
+CC = df.groupby(['category', 'country'], observed=True).size().unstack('category', fill_value=0)
+ALL_COUNTRY = df['country'].value_counts()
+
 def update_country_plot(selected_category, show_all):
     if show_all:
-        billionaires_count_by_country = df['country'].value_counts()
+        billionaires_count_by_country = ALL_COUNTRY
     else:
-        filtered_df = df[df['category'] == selected_category]
-        billionaires_count_by_country = filtered_df['country'].value_counts()
+        billionaires_count_by_country = CC[selected_category]
+        billionaires_count_by_country = billionaires_count_by_country[billionaires_count_by_country > 0].sort_values(ascending=False)
 
     country_counts = billionaires_count_by_country.reset_index()
     country_counts.columns = ['country', 'count']
 
-    barplot = country_counts.hvplot.barh(
-        y='count', x='country',
-        title=f'Number of Billionaires by Country ({selected_category if not show_all else "All Industries"})',
-        xlabel='Country', ylabel='Count of Billionaires',
-        color='count',
-        cmap='viridis', height=650, width=1000, logy=True,  # Log scale on x-axis
-        hover_cols=['country', 'count']
-    ).opts(
-        toolbar='above',
-        xrotation=45,
-        fontsize={'xticks': 7, 'yticks': 7}
-    )
-    return barplot
+    title = f'Number of Billionaires by Country ({selected_category if not show_all else "All Industries"})'
+    return hv.Bars(country_counts, 'country', 'count', label=title)
+
+country_plot = hv.DynamicMap(update_country_plot, streams=[
+    hv.streams.Params(category_select, ['value'], rename={'value': 'selected_category'}),
+    hv.streams.Params(show_all_industries, ['value'], rename={'value': 'show_all'}),
+]).opts(
+    invert_axes=True, xlabel='Country', ylabel='Count of Billionaires',
+    color='count', cmap='viridis', height=650, width=1000, logy=True,
+    tools=['hover'], toolbar='above', xrotation=45, fontsize={'xticks': 7, 'yticks': 7}, framewise=True
+)
 
 country_section = pn.Column(
     "### Number of Billionaires by Country",
     category_select,
     show_all_industries,
-    update_country_plot
+    country_plot
 )
 
 
@@ -152,19 +214,23 @@ country_section = pn.Column(
 
 age_slider = pn.widgets.RangeSlider(name='Age Range', start=0, end=100, value=(0, 40))
 
-@pn.depends(age_slider.param.value)
 def update_age_wealth_scatter(age_range):
-    filtered_df = df[(df['age'] >= age_range[0]) & (df['age'] <= age_range[1])]
-    scatter_age_wealth = filtered_df.hvplot.scatter(
-        x='age', y='finalWorth', title='Age vs. Wealth', legend='top_right',
-        height=450, width=500, color='blue', size=10
+    filtered_df = (
+        LF.filter(pl.col('age').is_between(age_range[0], age_range[1]))
+        .select('age', 'finalWorth')
+        .collect()
+        .to_pandas()
     )
-    return scatter_age_wealth
+    return hv.Points(filtered_df, ['age', 'finalWorth'])
+
+age_wealth_scatter = dynspread(rasterize(hv.DynamicMap(update_age_wealth_scatter, streams=[
+    hv.streams.Params(age_slider, ['value'], rename={'value': 'age_range'}),
+]))).opts(title='Age vs. Wealth', cnorm='eq_hist', cmap='Blues', height=450, width=500, framewise=True)
 
 age_wealth_section = pn.Column(
     "### Age vs. Wealth",
     age_slider,
-    update_age_wealth_scatter
+    age_wealth_scatter
 )
 
 
@@ -173,29 +239,41 @@ age_wealth_section = pn.Column(
 
 
 
-young_age_cutoff = 40
-df['age_group'] = df['age'].apply(lambda x: 'Young (<40)' if x < young_age_cutoff else 'Older (>=40)')
+from kernels import count_ind_age, counts_by_year
 
 age_slider = pn.widgets.RangeSlider(name='Age Range', start=0, end=100, value=(0, 40))
 
-@pn.depends(age_slider.param.value)
+# Writable copies of the kernel inputs, with the dtypes in the kernels.py signatures
+AGES = df['age'].to_numpy(np.int8, copy=True)
+IND_CODES = df['industries'].cat.codes.to_numpy(np.int32)
+N_IND = len(df['industries'].cat.categories)
+
 def update_young_billionaires(age_range):
-    filtered_df = df[(df['age'] >= age_range[0]) & (df['age'] <= age_range[1])]
+    counts = count_ind_age(AGES, IND_CODES, age_range[0], age_range[1], N_IND, young_age_cutoff)
+    observed = counts.sum(axis=1) > 0
 
-    age_distribution = filtered_df.groupby(['industries', 'age_group']).size().unstack(fill_value=0)
+    age_distribution = pd.DataFrame(
+        counts[observed],
+        index=pd.Index(df['industries'].cat.categories[observed], name='industries'),
+        columns=['Young (<40)', 'Older (>=40)']
+    )
+    # Keep the original alphabetical stack order (Older lightblue, Young salmon), not the kernel's column order
+    age_distribution = age_distribution[['Older (>=40)', 'Young (<40)']]
     age_distribution = age_distribution.reset_index().melt(id_vars='industries', value_name='count', var_name='age_group')
 
-    bar_plot = age_distribution.hvplot.bar(
-        x='industries', y='count', by='age_group', stacked=True,
-        title='Proportion of Young vs. Older Billionaires by Industry', legend='top_right',
-        height=450, width=500, color=['lightblue', 'salmon']
-    ).opts(xrotation=90)
-    return bar_plot
+    return hv.Bars(age_distribution, ['industries', 'age_group'], 'count')
+
+young_billionaires_plot = hv.DynamicMap(update_young_billionaires, streams=[
+    hv.streams.Params(age_slider, ['value'], rename={'value': 'age_range'}),
+]).opts(
+    stacked=True, title='Proportion of Young vs. Older Billionaires by Industry', legend_position='top_right',
+    height=450, width=500, cmap=['lightblue', 'salmon'], xrotation=90, framewise=True
+)
 
 young_billionaires_section = pn.Column(
     "### Proportion of Young Billionaires by Industry",
     age_slider,
-    update_young_billionaires
+    young_billionaires_plot
 )
 
 
@@ -204,47 +282,45 @@ young_billionaires_section = pn.Column(
 
 
 
-from matplotlib.ticker import MaxNLocator
-
 year_slider = pn.widgets.RangeSlider(name='Year Range', start=1910, end=2006, value=(1920, 2005))
 
-industries = df['industries'].unique().tolist()
+industries = df['industries'].cat.categories.tolist()
 industries.insert(0, 'All Industries')
 industry_select = pn.widgets.Select(name='Select Industry', options=industries, value='All Industries')
 
-@pn.depends(year_slider.param.value, industry_select.param.value)
-def update_billionaires_over_time(year_range, selected_industry):
-    filtered_df = df[(df['birthYear'] >= year_range[0]) & (df['birthYear'] <= year_range[1])]
-
-    if selected_industry != 'All Industries':
-        filtered_df = filtered_df[filtered_df['industries'] == selected_industry]
-
-    year_counts = filtered_df['birthYear'].value_counts().sort_index()
-
-    plt.figure(figsize=(3.5, 3))
-    sns.lineplot(x=year_counts.index, y=year_counts.values, label='Trend')
-    sns.scatterplot(x=year_counts.index, y=year_counts.values, color='red', s=10, label='Data Points')
-
-    plt.title(f'Number of Billionaires Over Time in {selected_industry}', fontsize=9)
-    plt.xlabel('Year', fontsize=7)
-    plt.ylabel('Number of Billionaires', fontsize=7)
-
-    plt.xticks(ticks=range(year_range[0], year_range[1] + 1, 5), rotation=45, fontsize=5)
-    plt.yticks(fontsize=5)
+# Writable copy, with the dtype in the counts_by_year signature
+BY = df['birthYear'].to_numpy(np.int16, copy=True)
+YEAR_MIN = int(BY.min())
+N_YEARS = int(BY.max()) - YEAR_MIN + 1
 
-    ax = plt.gca()
-    ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-    plt.legend(fontsize=6)
-    plt.tight_layout()
-
-    return pn.pane.Matplotlib(plt.gcf())
+def update_billionaires_over_time(year_range, selected_industry):
+    if selected_industry == 'All Industries':
+        target_ind = -1
+    else:
+        target_ind = df['industries'].cat.categories.get_loc(selected_industry)
+
+    counts = counts_by_year(BY, IND_CODES, year_range[0], year_range[1], target_ind, YEAR_MIN, N_YEARS)
+    present = np.flatnonzero(counts)
+    year_counts = pd.Series(counts[present], index=YEAR_MIN + present)
+
+    years = year_counts.index.to_numpy()
+    trend = hv.Curve((years, year_counts.values), 'Year', 'Number of Billionaires', label='Trend')
+    points = hv.Scatter((years, year_counts.values), 'Year', 'Number of Billionaires', label='Data Points')
+    return (trend * points).relabel(f'Number of Billionaires Over Time in {selected_industry}')
+
+billionaires_over_time_plot = hv.DynamicMap(update_billionaires_over_time, streams=[
+    hv.streams.Params(year_slider, ['value'], rename={'value': 'year_range'}),
+    hv.streams.Params(industry_select, ['value'], rename={'value': 'selected_industry'}),
+]).opts(
+    hv.opts.Scatter(size=4, color='red'),
+    hv.opts.Overlay(height=400, width=500, xrotation=45, yformatter='%d', legend_position='top_right', toolbar='above', framewise=True)
+)
 
 billionaires_over_time_section = pn.Column(
     "### Number of Billionaires Over Time by Industry",
     year_slider,
     industry_select,
-    update_billionaires_over_time
+    billionaires_over_time_plot
 )
 
 
@@ -258,32 +334,34 @@ from bokeh.models import HoverTool
 year_slider = pn.widgets.RangeSlider(name='Year Range', start=1910, end=2023, value=(1920, 2023))
 indicator_select = pn.widgets.Select(name='Select Economic Indicator', options=['CPI Change', 'Tax Revenue'])
 
-@pn.depends(year_slider.param.value, indicator_select.param.value)
+# x dimension, title and colormap for each indicator
+INDICATORS = {
+    'CPI Change': (hv.Dimension('cpi_change_country', label='CPI Change (%)'), 'Net Worth vs CPI Change', 'Greens'),
+    'Tax Revenue': (hv.Dimension('tax_revenue_country_country', label='Tax Revenue (in billions)'), 'Net Worth vs Tax Revenue', 'Purples'),
+}
+
 def update_scatter_plot(year_range, selected_indicator):
-    filtered_df = df[(df['birthYear'] >= year_range[0]) & (df['birthYear'] <= year_range[1])]
-
-    if selected_indicator == 'CPI Change':
-        scatter_plot = filtered_df.hvplot.scatter(
-            x='cpi_change_country', y='finalWorth', title='Net Worth vs CPI Change',
-            height=450, width=500, xlabel='CPI Change (%)', ylabel='Net Worth (in billions)',
-            color='green', size=10
-        )
-    elif selected_indicator == 'Tax Revenue':
-        scatter_plot = filtered_df.hvplot.scatter(
-            x='tax_revenue_country_country', y='finalWorth', title='Net Worth vs Tax Revenue',
-            height=450, width=500, xlabel='Tax Revenue (in billions)', ylabel='Net Worth (in billions)',
-            color='purple', size=10
-        )
-
-    return scatter_plot.opts(
-        toolbar='above'
+    x_dim, title, _ = INDICATORS[selected_indicator]
+    filtered_df = (
+        LF.filter(pl.col('birthYear').is_between(year_range[0], year_range[1]))
+        .select(x_dim.name, 'finalWorth')
+        .collect()
+        .to_pandas()
     )
+    return hv.Points(filtered_df, [x_dim, hv.Dimension('finalWorth', label='Net Worth (in billions)')], label=title)
+
+economic_scatter = dynspread(rasterize(hv.DynamicMap(update_scatter_plot, streams=[
+    hv.streams.Params(year_slider, ['value'], rename={'value': 'year_range'}),
+    hv.streams.Params(indicator_select, ['value'], rename={'value': 'selected_indicator'}),
+]))).apply.opts(
+    cmap=pn.bind(lambda selected_indicator: INDICATORS[selected_indicator][2], indicator_select)
+).opts(cnorm='eq_hist', height=450, width=500, toolbar='above', framewise=True)
 
 economic_indicators = pn.Column(
     "### Analyze the Correlation Between Economic Indicators and Billionaire Wealth",
     year_slider,
     indicator_select,
-    update_scatter_plot
+    economic_scatter
 )
 
 
@@ -0,0 +1,29 @@
+# Numba kernels used by the dashboard callbacks in analysis.py.
+# Explicit signatures compile them at import, and cache=True stores the machine code in __pycache__
+# so later processes load it instead of recompiling (see prewarm.py). nogil=True lets callbacks running
+# on Panel's thread pool execute them concurrently.
+
+import numpy as np
+from numba import njit
+
+
+@njit('int64[:,:](int8[:], int32[:], int64, int64, int64, int64)', cache=True, nogil=True)
+def count_ind_age(ages, codes, lo, hi, n_ind, young_age_cutoff):
+    # Single pass: filter on the age range and count per industry code, column 0 young / column 1 older
+    out = np.zeros((n_ind, 2), np.int64)
+    for i in range(ages.size):
+        a = ages[i]
+        if lo <= a <= hi:
+            out[codes[i], 0 if a < young_age_cutoff else 1] += 1
+    return out
+
+
+@njit('int64[:](int16[:], int32[:], int64, int64, int64, int64, int64)', cache=True, nogil=True)
+def counts_by_year(by, ind_codes, lo, hi, target_ind, year_min, n_years):
+    # Bincount of birth years within [lo, hi], optionally restricted to one industry code (-1 = all)
+    out = np.zeros(n_years, np.int64)
+    for i in range(by.size):
+        y = by[i]
+        if lo <= y <= hi and (target_ind < 0 or ind_codes[i] == target_ind):
+            out[y - year_min] += 1
+    return out
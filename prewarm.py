@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Run at deploy time so the Numba kernels are compiled and written to the on-disk cache
+# before the dashboard serves its first interaction.
+
+import numpy as np
+
+from kernels import count_ind_age, counts_by_year
+
+count_ind_age(np.zeros(1, np.int8), np.zeros(1, np.int32), 0, 100, 1, 40)
+counts_by_year(np.zeros(1, np.int16), np.zeros(1, np.int32), 0, 0, -1, 0, 1)
+print('Numba kernels compiled and cached')